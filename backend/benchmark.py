@@ -0,0 +1,220 @@
+"""Query benchmark for the storage layer at configurable data sizes.
+
+For every ``users:messages`` size the database is seeded (see
+``seed_data.py``), then each query the API issues is replayed against random
+users and timed together with the pydantic response building the route does.
+Query plans are recorded alongside the timings so index and schema changes can
+be compared by diffing two reports. The report also compares the Socket.IO
+wire protocols from ``wire.py`` by bytes and encode/decode time per message.
+
+Usage (from the ``backend`` directory)::
+
+    python benchmark.py --sizes 10000:100000,1000000:500000000 --output bench.json
+    python benchmark.py --backend memory --sizes 1000:10000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from datetime import datetime
+
+from socketio import msgpack_packet, packet
+
+from models import MessageResponse, UserResponse
+from seed_data import build_messages, build_users, ensure_indexes, get_database, seed, user_id_for, username_for
+from wire import decode_new_message, encode_new_message, uses_sender_profile
+
+
+def _register_check(db, user_index):
+    # Mirrors the duplicate check in ``register``
+    username = username_for(user_index)
+    query = {"$or": [{"username": username}, {"email": f"{username}@example.com"}]}
+    return db.users.find(query).limit(1), lambda docs: docs
+
+
+def _get_users(db, user_index):
+    query = {"id": {"$ne": user_id_for(user_index)}}
+    return db.users.find(query).limit(1000), lambda docs: [UserResponse(**doc) for doc in docs]
+
+
+def _get_messages(db, user_index, total_users):
+    user_id = user_id_for(user_index)
+    other_id = user_id_for((user_index + 1) % total_users)
+    query = {
+        "$or": [
+            {"sender_id": user_id, "receiver_id": other_id},
+            {"sender_id": other_id, "receiver_id": user_id}
+        ],
+        "expires_at": {"$not": {"$lte": datetime.utcnow()}}
+    }
+    cursor = db.messages.find(query).sort("timestamp", 1).limit(1000)
+    return cursor, lambda docs: [MessageResponse(**doc) for doc in docs]
+
+
+QUERIES = {
+    "register_duplicate_check": lambda db, i, n: _register_check(db, i),
+    "get_users": lambda db, i, n: _get_users(db, i),
+    "get_messages": _get_messages,
+}
+
+
+def _summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def _plan_summary(cursor):
+    """Condense ``explain()`` output to the fields worth comparing."""
+    try:
+        explain = cursor.explain()
+    except (AttributeError, NotImplementedError):
+        # mongomock has no query planner
+        return None
+
+    def stages(plan):
+        chain = []
+        while plan:
+            chain.append(plan.get("stage", "?") + (f"({plan['indexName']})" if "indexName" in plan else ""))
+            plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+        return chain
+
+    planner = explain.get("queryPlanner", {})
+    stats = explain.get("executionStats", {})
+    return {
+        "winning_plan": stages(planner.get("winningPlan", {})),
+        "n_returned": stats.get("nReturned"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "execution_ms": stats.get("executionTimeMillis"),
+    }
+
+
+def run_queries(db, total_users, iterations, rng):
+    results = {}
+    for name, build in QUERIES.items():
+        query_samples, model_samples = [], []
+        for _ in range(iterations):
+            cursor, to_models = build(db, rng.randrange(total_users), total_users)
+            started = time.perf_counter()
+            docs = list(cursor)
+            fetched = time.perf_counter()
+            to_models(docs)
+            query_samples.append(fetched - started)
+            model_samples.append(time.perf_counter() - fetched)
+
+        cursor, _ = build(db, rng.randrange(total_users), total_users)
+        results[name] = {
+            "query": _summarize(query_samples),
+            "models": _summarize(model_samples),
+            "plan": _plan_summary(cursor),
+        }
+    return results
+
+
+def run_wire_benchmark(samples):
+    """Compare ``new_message`` packets across wire protocols."""
+    messages = build_messages(samples, 1000, seed=0)
+    sender = UserResponse(**build_users(0, 1)[0]).dict()
+    results = {}
+    for protocol, packet_class in (("json", packet.Packet), ("msgpack", msgpack_packet.MsgPackPacket)):
+        profile = sender if uses_sender_profile(protocol) else None
+
+        started = time.perf_counter()
+        encoded = [
+            packet_class(packet.EVENT, data=["new_message", encode_new_message(message, profile, protocol)]).encode()
+            for message in messages
+        ]
+        encode_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for data in encoded:
+            decode_new_message(packet_class(encoded_packet=data).data[1])
+        decode_seconds = time.perf_counter() - started
+
+        total_bytes = sum(len(data.encode() if isinstance(data, str) else data) for data in encoded)
+        results[protocol] = {
+            "bytes_per_message": total_bytes / samples,
+            "encode_us": encode_seconds / samples * 1e6,
+            "decode_us": decode_seconds / samples * 1e6,
+        }
+    return results
+
+
+def parse_sizes(value):
+    sizes = []
+    for item in value.split(","):
+        users, messages = item.split(":")
+        sizes.append((int(users), int(messages)))
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API queries at configurable data sizes")
+    parser.add_argument("--backend", choices=["mongo", "memory"], default="mongo")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-prefix", default="bench")
+    parser.add_argument("--sizes", type=parse_sizes, default=parse_sizes("1000:10000,10000:100000"),
+                        help="Comma separated users:messages pairs")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--reuse", action="store_true",
+                        help="Skip seeding when a database of the right size already exists")
+    parser.add_argument("--wire-samples", type=int, default=10000,
+                        help="Messages to encode for the wire protocol comparison, 0 to skip")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    report = {"started_at": datetime.utcnow().isoformat(), "backend": args.backend, "runs": []}
+
+    for users, messages in args.sizes:
+        db_name = f"{args.db_prefix}_{users}_{messages}"
+        db = get_database(args.backend, args.mongo_url, db_name)
+        seeded = (args.reuse
+                  and db.users.estimated_document_count() == users
+                  and db.messages.estimated_document_count() == messages)
+        timings = {} if seeded else seed(args.backend, args.mongo_url, db_name, users, messages,
+                                         workers=args.workers, drop=True)
+        # Reused databases may predate index changes
+        ensure_indexes(db)
+
+        run = {
+            "users": users,
+            "messages": messages,
+            "seed": timings,
+            "indexes": {
+                "users": sorted(db.users.index_information()),
+                "messages": sorted(db.messages.index_information()),
+            },
+            "queries": run_queries(db, users, args.iterations, rng),
+        }
+        report["runs"].append(run)
+
+        print(f"\n{users} users / {messages} messages")
+        for name, result in run["queries"].items():
+            plan = result["plan"] or {}
+            print(f"  {name:<26} query p50 {result['query']['p50_ms']:8.2f}ms "
+                  f"p95 {result['query']['p95_ms']:8.2f}ms  "
+                  f"models p50 {result['models']['p50_ms']:8.2f}ms  "
+                  f"plan {' <- '.join(plan.get('winning_plan', [])) or 'n/a'}")
+
+    if args.wire_samples:
+        report["wire"] = run_wire_benchmark(args.wire_samples)
+        print("\nnew_message wire protocols")
+        for protocol, result in report["wire"].items():
+            print(f"  {protocol:<8} {result['bytes_per_message']:7.1f} bytes  "
+                  f"encode {result['encode_us']:6.1f}us  decode {result['decode_us']:6.1f}us")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
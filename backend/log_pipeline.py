@@ -0,0 +1,217 @@
+"""Non-blocking structured logging.
+
+Records are handed to a background thread through a bounded queue, so the
+event loop never waits on log I/O; the thread formats them as one JSON object
+per line. When the queue is full, records are dropped and counted rather than
+blocking the caller.
+
+Every record carries the correlation ids bound in the current context:
+``request_id`` for HTTP requests and ``sid``/``user_id`` for Socket.IO events.
+
+Records can be sampled per event type. The event type is the ``event`` extra
+passed to the logging call, falling back to the logger name, so noisy sources
+such as ``engineio.server`` can be thinned out without touching their code.
+Warnings and errors are never sampled out. Levels and sample rates can be
+changed at runtime with ``configure``.
+"""
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+sid_var: ContextVar[Optional[str]] = ContextVar('sid', default=None)
+user_id_var: ContextVar[Optional[str]] = ContextVar('user_id', default=None)
+
+CONTEXT_VARS = {'request_id': request_id_var, 'sid': sid_var, 'user_id': user_id_var}
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'event'} | set(CONTEXT_VARS)
+
+# Loggers that install their own handlers and stop propagation, which would
+# bypass the queue and write unformatted lines from the event loop
+TAKEOVER_LOGGERS = ('uvicorn', 'uvicorn.access', 'uvicorn.error')
+
+_sample_rates: Dict[str, float] = {}
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional['NonBlockingQueueHandler'] = None
+
+
+class ContextFilter(logging.Filter):
+    """Attach correlation ids and apply per-event sampling."""
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            event = getattr(record, 'event', None) or record.name
+            rate = _sample_rates.get(event, 1.0)
+            if rate < 1.0 and random.random() >= rate:
+                return False
+
+        for name, var in CONTEXT_VARS.items():
+            if not hasattr(record, name):
+                setattr(record, name, var.get())
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread. Only resolve the message
+        # here, since the arguments may change after this call returns.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'event', None):
+            entry['event'] = record.event
+        for name in CONTEXT_VARS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level: str = 'INFO', sample_rates: Optional[Dict[str, float]] = None,
+                  logger_levels: Optional[Dict[str, str]] = None, queue_size: int = 10000):
+    """Route all logging through the background writer."""
+    global _listener, _handler
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    _handler = NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    for name in TAKEOVER_LOGGERS:
+        taken_over = logging.getLogger(name)
+        for existing in list(taken_over.handlers):
+            taken_over.removeHandler(existing)
+        taken_over.propagate = True
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+
+    configure(level=level, sample_rates=sample_rates, logger_levels=logger_levels)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure(level: Optional[str] = None, sample_rates: Optional[Dict[str, float]] = None,
+              logger_levels: Optional[Dict[str, str]] = None):
+    """Change levels and sample rates at runtime.
+
+    A sample rate of 1 keeps every record of that event type and 0 drops all
+    of them below WARNING.
+    """
+    if level:
+        logging.getLogger().setLevel(level.upper())
+    for name, logger_level in (logger_levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level.upper())
+    for event, rate in (sample_rates or {}).items():
+        _sample_rates[event] = min(1.0, max(0.0, float(rate)))
+
+
+def current_config(logger_names=()) -> Dict:
+    return {
+        'level': logging.getLevelName(logging.getLogger().level),
+        'logger_levels': {
+            name: logging.getLevelName(logging.getLogger(name).level) for name in logger_names
+        },
+        'sample_rates': dict(_sample_rates),
+        'dropped_records': _handler.dropped if _handler else 0,
+    }
+
+
+class RequestIdMiddleware:
+    """Bind ``request_id`` for every HTTP request and echo it in the response.
+
+    Written as plain ASGI so requests are not routed through an extra task
+    and response stream, as ``BaseHTTPMiddleware`` does.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        request_id = next(
+            (value.decode('latin-1')[:128] for name, value in scope['headers'] if name == b'x-request-id'), None
+        ) or uuid.uuid4().hex
+        header = (b'x-request-id', request_id.encode('latin-1'))
+
+        async def send_with_request_id(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', []), header]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+def bind_socket_context(sio, connected_users: Dict[str, str], namespace: str = '/'):
+    """Bind ``sid`` and ``user_id`` for the duration of every Socket.IO handler."""
+    handlers = sio.handlers.get(namespace, {})
+    for event, handler in list(handlers.items()):
+        handlers[event] = _with_socket_context(handler, connected_users)
+
+
+def _with_socket_context(handler, connected_users):
+    @functools.wraps(handler)
+    async def wrapper(sid, *args):
+        sid_token = sid_var.set(sid)
+        user_token = user_id_var.set(connected_users.get(sid))
+        try:
+            return await handler(sid, *args)
+        finally:
+            user_id_var.reset(user_token)
+            sid_var.reset(sid_token)
+    return wrapper
@@ -0,0 +1,161 @@
+"""Event loop lag monitoring and sampling profiler.
+
+A ticker task on the event loop sleeps for a fixed interval and records how
+late it wakes up; that delay is time the loop spent running something else
+without yielding. A watchdog thread watches the ticker's heartbeat and, when
+the loop stalls for longer than the threshold, captures the loop thread's
+stack while the blocking code is still running. The stack is attributed to
+the API route or Socket.IO event whose handler appears in it.
+
+The same thread can sample the loop thread's stack on demand, which gives a
+low overhead profile of a live server.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, max_events: int = 100):
+        self.interval = interval
+        self.threshold = threshold
+        self.slow_callbacks = deque(maxlen=max_events)
+
+        self._handlers = {}
+        self._loop_thread_id = None
+        self._heartbeat = time.monotonic()
+        self._pending = None
+        # Guards the heartbeat/pending handoff between the loop and the watchdog
+        self._lock = threading.Lock()
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+        self._ticks = 0
+        self._stalls = 0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+        self._avg_lag = 0.0
+
+    def register_handler(self, name: str, func: Callable):
+        code = getattr(func, "__code__", None)
+        if code is not None:
+            self._handlers[code] = name
+
+    def start(self):
+        """Start monitoring the running event loop."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _tick(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            with self._lock:
+                self._heartbeat = now
+                pending, self._pending = self._pending, None
+
+            self._ticks += 1
+            self._last_lag = lag
+            self._max_lag = max(self._max_lag, lag)
+            self._avg_lag += (lag - self._avg_lag) * 0.05
+
+            if pending is not None:
+                pending["blocked_ms"] = round(lag * 1000, 1)
+                logger.warning("Event loop blocked for %sms in %s",
+                               pending["blocked_ms"], pending["handler"] or "unknown handler")
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled_for = time.monotonic() - heartbeat - self.interval
+            if stalled_for < self.threshold or self._pending is not None:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            event = {
+                "at": datetime.utcnow().isoformat(),
+                "handler": self._find_handler(frame),
+                "blocked_ms": None,
+                "stack": traceback.format_stack(frame),
+            }
+            del frame
+
+            with self._lock:
+                # If the ticker ran meanwhile, the loop had already resumed and
+                # the stack may belong to whatever ran after the stall
+                if self._heartbeat != heartbeat or self._pending is not None:
+                    continue
+                self._stalls += 1
+                self._pending = event
+                self.slow_callbacks.append(event)
+
+    def _find_handler(self, frame) -> Optional[str]:
+        while frame is not None:
+            name = self._handlers.get(frame.f_code)
+            if name:
+                return name
+            frame = frame.f_back
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "ticks": self._ticks,
+            "stalls": self._stalls,
+            "last_lag_ms": round(self._last_lag * 1000, 2),
+            "avg_lag_ms": round(self._avg_lag * 1000, 2),
+            "max_lag_ms": round(self._max_lag * 1000, 2),
+            "slow_callbacks": list(self.slow_callbacks),
+        }
+
+    def _sample(self, seconds: float, sample_interval: float) -> Dict:
+        stacks = Counter()
+        handlers = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                samples += 1
+                handlers[self._find_handler(frame) or "idle/other"] += 1
+                frames = traceback.extract_stack(frame)
+                stacks[";".join(f"{f.name} ({f.filename.rsplit('/', 1)[-1]}:{f.lineno})" for f in frames)] += 1
+            time.sleep(sample_interval)
+        return {"samples": samples, "handlers": handlers, "stacks": stacks}
+
+    async def profile(self, seconds: float = 5.0, sample_interval: float = 0.005, top: int = 50) -> Dict:
+        """Sample the event loop thread's stack for ``seconds``.
+
+        Stacks are returned in collapsed form (frames joined by ``;``, root
+        first) with sample counts, ready for flame graph tools.
+        """
+        result = await asyncio.to_thread(self._sample, seconds, sample_interval)
+        return {
+            "seconds": seconds,
+            "samples": result["samples"],
+            "handlers": dict(result["handlers"].most_common()),
+            "stacks": [{"stack": stack, "count": count} for stack, count in result["stacks"].most_common(top)],
+        }
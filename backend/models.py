@@ -0,0 +1,91 @@
+"""Document and request/response models shared by the API and the tooling.
+
+Kept free of side effects so ``seed_data.py`` and ``benchmark.py`` can build
+documents with exactly the shapes ``server.py`` stores and reads back.
+"""
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field, StrictInt
+
+# (collection, keys, options) for every index the API relies on. Created by
+# the server at startup and by seed_data.py after bulk loading.
+INDEXES = [
+    # Roster lookups on connect and the message history queries
+    ("messages", [("sender_id", 1), ("receiver_id", 1), ("timestamp", 1)], {}),
+    ("messages", [("receiver_id", 1), ("sender_id", 1)], {}),
+    # Messages without expires_at never expire
+    ("messages", [("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ("contacts", [("owner_id", 1), ("contact_id", 1)], {"unique": True}),
+    ("conversation_settings", [("conversation_key", 1)], {"unique": True}),
+]
+
+class User(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    username: str
+    email: str
+    password_hash: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    is_online: bool = False
+
+class UserCreate(BaseModel):
+    username: str
+    email: str
+    password: str
+
+class UserLogin(BaseModel):
+    username: str
+    password: str
+
+class UserResponse(BaseModel):
+    id: str
+    username: str
+    email: str
+    is_online: bool
+
+class Message(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    sender_id: str
+    receiver_id: str
+    content: str
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    message_type: str = "text"
+    expires_at: Optional[datetime] = None
+
+class MessageCreate(BaseModel):
+    receiver_id: str
+    content: str
+    message_type: str = "text"
+    ttl_seconds: Optional[StrictInt] = Field(default=None, gt=0)
+
+class MessageResponse(BaseModel):
+    id: str
+    sender_id: str
+    receiver_id: str
+    content: str
+    timestamp: datetime
+    message_type: str
+    expires_at: Optional[datetime] = None
+
+class ConversationSettings(BaseModel):
+    conversation_key: str
+    participants: List[str]
+    ttl_seconds: Optional[int] = None
+
+class ConversationExpiryUpdate(BaseModel):
+    ttl_seconds: Optional[StrictInt] = Field(default=None, gt=0)
+
+class Contact(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    owner_id: str
+    contact_id: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ContactCreate(BaseModel):
+    contact_id: str
+
+class LoggingConfigUpdate(BaseModel):
+    level: Optional[str] = None
+    logger_levels: Optional[Dict[str, str]] = None
+    sample_rates: Optional[Dict[str, float]] = None
@@ -0,0 +1,202 @@
+"""Bulk seeding of synthetic users and messages.
+
+Documents are built from the same ``User`` and ``Message`` models the API
+uses, so the data on disk has exactly the shape ``server.py`` reads back, and
+the API's indexes are created once loading is done. User ids are derived
+deterministically from the user index, which lets every worker generate its
+share of users and messages without coordinating.
+
+Seeding goes to its own database by default; pass ``--drop`` to clear the
+target collections first.
+
+Usage (from the ``backend`` directory)::
+
+    python seed_data.py --users 1000000 --messages 500000000 --workers 8 --drop
+    python seed_data.py --backend memory --users 10000 --messages 100000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import bcrypt
+from pymongo import MongoClient
+
+from models import INDEXES, Message, User
+
+USER_NAMESPACE = uuid.UUID("5f0c2a8e-6a43-4e0e-9d0b-9a4f2f1c7d11")
+DEFAULT_PASSWORD = "password123"
+DEFAULT_DB_NAME = "seed_data"
+BATCH_SIZE = 5000
+
+# Each user talks to a handful of regular partners, which matches real chat
+# traffic far better than uniformly random pairs.
+PARTNERS_PER_USER = 8
+HISTORY_DAYS = 365
+
+_clients = {}
+_password_hash = None
+
+
+def user_id_for(index: int) -> str:
+    return str(uuid.uuid5(USER_NAMESPACE, f"user-{index}"))
+
+
+def username_for(index: int) -> str:
+    return f"user{index:07d}"
+
+
+def get_database(backend: str, mongo_url: str, db_name: str):
+    """Return a pymongo-compatible database for the requested backend.
+
+    Clients are cached per process so worker tasks reuse their connection.
+    Workers are spawned rather than forked, so they never inherit a client.
+    """
+    key = (backend, mongo_url)
+    if key not in _clients:
+        if backend == "memory":
+            try:
+                import mongomock
+            except ImportError:
+                raise SystemExit("The memory backend requires mongomock: pip install mongomock")
+            _clients[key] = mongomock.MongoClient()
+        else:
+            _clients[key] = MongoClient(mongo_url)
+    return _clients[key][db_name]
+
+
+def _get_password_hash() -> str:
+    # bcrypt is deliberately slow; hash once per process and share it
+    global _password_hash
+    if _password_hash is None:
+        _password_hash = bcrypt.hashpw(DEFAULT_PASSWORD.encode(), bcrypt.gensalt()).decode()
+    return _password_hash
+
+
+def build_users(start: int, stop: int) -> list:
+    password_hash = _get_password_hash()
+    return [
+        User(
+            id=user_id_for(i),
+            username=username_for(i),
+            email=f"{username_for(i)}@example.com",
+            password_hash=password_hash,
+        ).dict()
+        for i in range(start, stop)
+    ]
+
+
+def build_messages(count: int, total_users: int, seed: int) -> list:
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    messages = []
+    for _ in range(count):
+        sender = rng.randrange(total_users)
+        offset = rng.randrange(1, PARTNERS_PER_USER + 1)
+        receiver = (sender + offset) % total_users
+        if receiver == sender:
+            receiver = (sender + 1) % total_users
+        messages.append(Message(
+            sender_id=user_id_for(sender),
+            receiver_id=user_id_for(receiver),
+            content=f"synthetic message {rng.getrandbits(32):08x}",
+            timestamp=now - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400)),
+        ).dict())
+    return messages
+
+
+def ensure_indexes(db):
+    for collection, keys, options in INDEXES:
+        db[collection].create_index(keys, **options)
+
+
+def _insert_users(backend, mongo_url, db_name, start, stop):
+    db = get_database(backend, mongo_url, db_name)
+    db.users.insert_many(build_users(start, stop), ordered=False)
+    return stop - start
+
+
+def _insert_messages(backend, mongo_url, db_name, count, total_users, seed):
+    db = get_database(backend, mongo_url, db_name)
+    db.messages.insert_many(build_messages(count, total_users, seed), ordered=False)
+    return count
+
+
+def seed(backend: str, mongo_url: str, db_name: str, users: int, messages: int,
+         workers: int = 4, batch_size: int = BATCH_SIZE, drop: bool = False, seed_value: int = 0) -> dict:
+    """Populate ``db_name`` with ``users`` users and ``messages`` messages.
+
+    Returns timing information for the load and index phases.
+    """
+    db = get_database(backend, mongo_url, db_name)
+    if drop:
+        db.users.drop()
+        db.messages.drop()
+
+    # mongomock lives inside this process, so only threads can share it
+    if backend == "memory":
+        executor = ThreadPoolExecutor(max_workers=workers)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    timings = {}
+
+    with executor:
+        started = time.perf_counter()
+        futures = [
+            executor.submit(_insert_users, backend, mongo_url, db_name, start, min(start + batch_size, users))
+            for start in range(0, users, batch_size)
+        ]
+        for future in as_completed(futures):
+            future.result()
+        timings["users_seconds"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        futures = [
+            executor.submit(_insert_messages, backend, mongo_url, db_name,
+                            min(batch_size, messages - start), users, seed_value + batch)
+            for batch, start in enumerate(range(0, messages, batch_size))
+        ]
+        for future in as_completed(futures):
+            future.result()
+        timings["messages_seconds"] = time.perf_counter() - started
+
+    # Indexes are built after loading, which is much faster than maintaining
+    # them through every insert
+    started = time.perf_counter()
+    ensure_indexes(db)
+    timings["indexes_seconds"] = time.perf_counter() - started
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed synthetic users and messages")
+    parser.add_argument("--backend", choices=["mongo", "memory"], default="mongo")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default=DEFAULT_DB_NAME)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--drop", action="store_true", help="Drop the users and messages collections first")
+    args = parser.parse_args()
+
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+
+    timings = seed(args.backend, args.mongo_url, args.db_name, args.users, args.messages,
+                   workers=args.workers, batch_size=args.batch_size, drop=args.drop,
+                   seed_value=args.seed)
+    print(f"Seeded {args.users} users in {timings['users_seconds']:.1f}s "
+          f"and {args.messages} messages in {timings['messages_seconds']:.1f}s "
+          f"into {args.db_name} ({args.backend})")
+    print(f"All users share the password '{DEFAULT_PASSWORD}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,29 @@ from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import json
+import asyncio
+import inspect
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
 from typing import List, Optional
-import uuid
 from datetime import datetime, timedelta
 import socketio
 import jwt
 from passlib.context import CryptContext
 import bcrypt
 from bson import ObjectId
+from pydantic import ValidationError
+from log_pipeline import (
+    RequestIdMiddleware, bind_socket_context, configure as configure_logging,
+    current_config as current_logging_config, setup_logging, shutdown_logging, user_id_var
+)
+from loop_monitor import LoopMonitor
+from models import (
+    INDEXES, Contact, ContactCreate, ConversationExpiryUpdate, ConversationSettings, LoggingConfigUpdate,
+    Message, MessageCreate, MessageResponse, User, UserCreate, UserLogin, UserResponse
+)
+from wire import encode_new_message, socketio_serializer, uses_sender_profile
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -29,6 +41,28 @@ JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-here')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24
 
+# Users allowed to call the /api/admin diagnostics endpoints
+ADMIN_USERNAMES = set(filter(None, os.environ.get('ADMIN_USERNAMES', '').split(',')))
+
+# Event loop lag monitoring, see loop_monitor.py
+loop_monitor = LoopMonitor(
+    interval=float(os.environ.get('LOOP_LAG_INTERVAL_MS', 50)) / 1000,
+    threshold=float(os.environ.get('LOOP_LAG_THRESHOLD_MS', 100)) / 1000
+)
+
+# The TTL index on messages.expires_at deletes expired messages; participants
+# are told about them in batches every EXPIRY_NOTIFY_SECONDS
+EXPIRY_NOTIFY_SECONDS = float(os.environ.get('EXPIRY_NOTIFY_SECONDS', 5))
+EXPIRY_NOTIFY_BATCH = 1000
+
+# End of the window the notifier's passes have covered. Messages inserted later
+# but due inside it are announced by their insert path instead.
+expiry_notified_until: Optional[datetime] = None
+expiry_notices = set()
+
+# Socket.IO wire protocol: "json" (default) or "msgpack", see wire.py
+WIRE_PROTOCOL = os.environ.get('WIRE_PROTOCOL', 'json')
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
@@ -36,8 +70,9 @@ security = HTTPBearer()
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins="*",
-    logger=True,
-    engineio_logger=True
+    serializer=socketio_serializer(WIRE_PROTOCOL),
+    logger=logging.getLogger('socketio.server'),
+    engineio_logger=logging.getLogger('engineio.server')
 )
 
 # Create the main app
@@ -49,51 +84,6 @@ socket_app = socketio.ASGIApp(sio, app)
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Models
-class User(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    username: str
-    email: str
-    password_hash: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    is_online: bool = False
-
-class UserCreate(BaseModel):
-    username: str
-    email: str
-    password: str
-
-class UserLogin(BaseModel):
-    username: str
-    password: str
-
-class UserResponse(BaseModel):
-    id: str
-    username: str
-    email: str
-    is_online: bool
-
-class Message(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    sender_id: str
-    receiver_id: str
-    content: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
-    message_type: str = "text"
-
-class MessageCreate(BaseModel):
-    receiver_id: str
-    content: str
-    message_type: str = "text"
-
-class MessageResponse(BaseModel):
-    id: str
-    sender_id: str
-    receiver_id: str
-    content: str
-    timestamp: datetime
-    message_type: str
-
 # Utility functions
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -108,12 +98,40 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
+async def get_roster(user_id: str) -> set:
+    """Users whose presence user_id follows: conversation partners plus explicit contacts"""
+    roster = set(await db.messages.distinct("receiver_id", {"sender_id": user_id}))
+    roster.update(await db.messages.distinct("sender_id", {"receiver_id": user_id}))
+    roster.update(await db.contacts.distinct("contact_id", {"owner_id": user_id}))
+    roster.discard(user_id)
+    return roster
+
+def conversation_key(user_id: str, other_user_id: str) -> str:
+    return ":".join(sorted([user_id, other_user_id]))
+
+async def get_conversation_ttl(user_id: str, other_user_id: str) -> Optional[int]:
+    """The conversation's default message TTL in seconds, None for no expiry"""
+    settings = await db.conversation_settings.find_one(
+        {"conversation_key": conversation_key(user_id, other_user_id)},
+        {"_id": 0, "ttl_seconds": 1}
+    )
+    return settings.get("ttl_seconds") if settings else None
+
+async def message_expiry(sender_id: str, receiver_id: str, ttl_seconds: Optional[int] = None) -> Optional[datetime]:
+    """A per-message TTL wins over the conversation's default"""
+    if ttl_seconds is None:
+        ttl_seconds = await get_conversation_ttl(sender_id, receiver_id)
+    if not ttl_seconds:
+        return None
+    return datetime.utcnow() + timedelta(seconds=ttl_seconds)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
+        user_id_var.set(user_id)
         
         user = await db.users.find_one({"id": user_id})
         if user is None:
@@ -122,6 +140,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    if current_user.username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
 # Authentication Routes
 @api_router.post("/auth/register", response_model=UserResponse)
 async def register(user_data: UserCreate):
@@ -175,6 +198,28 @@ async def get_users(current_user: User = Depends(get_current_user)):
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     return UserResponse(**current_user.dict())
 
+# Contact Routes
+@api_router.get("/contacts", response_model=List[UserResponse])
+async def get_contacts(current_user: User = Depends(get_current_user)):
+    roster = await get_roster(current_user.id)
+    users = await db.users.find({"id": {"$in": list(roster)}}).to_list(len(roster))
+    return [UserResponse(**user) for user in users]
+
+@api_router.post("/contacts", response_model=UserResponse)
+async def add_contact(contact_data: ContactCreate, current_user: User = Depends(get_current_user)):
+    contact = await db.users.find_one({"id": contact_data.contact_id})
+    if not contact or contact["id"] == current_user.id:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    
+    await db.contacts.update_one(
+        {"owner_id": current_user.id, "contact_id": contact_data.contact_id},
+        {"$setOnInsert": Contact(owner_id=current_user.id, contact_id=contact_data.contact_id).dict()},
+        upsert=True
+    )
+    await subscribe_presence(current_user.id, contact_data.contact_id)
+    
+    return UserResponse(**contact)
+
 # Message Routes
 @api_router.post("/messages", response_model=MessageResponse)
 async def send_message(message_data: MessageCreate, current_user: User = Depends(get_current_user)):
@@ -186,15 +231,19 @@ async def send_message(message_data: MessageCreate, current_user: User = Depends
     # Create message
     message_dict = message_data.dict()
     message_dict["sender_id"] = current_user.id
+    message_dict["expires_at"] = await message_expiry(
+        current_user.id, message_data.receiver_id, message_dict.pop("ttl_seconds")
+    )
     message = Message(**message_dict)
     
     await db.messages.insert_one(message.dict())
+    schedule_expiry_notice(message)
+    await subscribe_conversation_presence(current_user.id, message_data.receiver_id)
     
     # Emit message to receiver via Socket.IO
-    await sio.emit('new_message', {
-        'message': message.dict(),
-        'sender': UserResponse(**current_user.dict()).dict()
-    }, room=f"user_{message_data.receiver_id}")
+    sender = UserResponse(**current_user.dict()).dict() if uses_sender_profile(WIRE_PROTOCOL) else None
+    await sio.emit('new_message', encode_new_message(message.dict(), sender, WIRE_PROTOCOL),
+                   room=f"user_{message_data.receiver_id}")
     
     return MessageResponse(**message.dict())
 
@@ -204,17 +253,85 @@ async def get_messages(user_id: str, current_user: User = Depends(get_current_us
         "$or": [
             {"sender_id": current_user.id, "receiver_id": user_id},
             {"sender_id": user_id, "receiver_id": current_user.id}
-        ]
+        ],
+        # The TTL monitor only runs periodically, so skip anything already due
+        "expires_at": {"$not": {"$lte": datetime.utcnow()}}
     }).sort("timestamp", 1).to_list(1000)
     
     return [MessageResponse(**message) for message in messages]
 
+@api_router.get("/conversations/{user_id}/expiry", response_model=ConversationExpiryUpdate)
+async def get_conversation_expiry(user_id: str, current_user: User = Depends(get_current_user)):
+    other_user = await db.users.find_one({"id": user_id})
+    if not other_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return ConversationExpiryUpdate(ttl_seconds=await get_conversation_ttl(current_user.id, user_id))
+
+@api_router.put("/conversations/{user_id}/expiry", response_model=ConversationExpiryUpdate)
+async def update_conversation_expiry(user_id: str, expiry: ConversationExpiryUpdate,
+                                     current_user: User = Depends(get_current_user)):
+    other_user = await db.users.find_one({"id": user_id})
+    if not other_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    key = conversation_key(current_user.id, user_id)
+    settings = ConversationSettings(
+        conversation_key=key,
+        participants=sorted([current_user.id, user_id]),
+        ttl_seconds=expiry.ttl_seconds
+    )
+    await db.conversation_settings.update_one({"conversation_key": key}, {"$set": settings.dict()}, upsert=True)
+    
+    return expiry
+
+# Admin Routes
+@api_router.get("/admin/loop-lag")
+async def get_loop_lag(admin: User = Depends(get_admin_user)):
+    return loop_monitor.stats()
+
+@api_router.get("/admin/profile")
+async def get_profile(seconds: float = 5.0, admin: User = Depends(get_admin_user)):
+    if not 0 < seconds <= 60:
+        raise HTTPException(status_code=400, detail="seconds must be between 0 and 60")
+    return await loop_monitor.profile(seconds)
+
+@api_router.get("/admin/logging")
+async def get_logging_config(admin: User = Depends(get_admin_user)):
+    return current_logging_config(SOCKETIO_LOGGERS)
+
+@api_router.put("/admin/logging")
+async def update_logging_config(config: LoggingConfigUpdate, admin: User = Depends(get_admin_user)):
+    try:
+        configure_logging(level=config.level, logger_levels=config.logger_levels, sample_rates=config.sample_rates)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return current_logging_config(SOCKETIO_LOGGERS)
+
 # Socket.IO Events
 connected_users = {}
 
+# sid -> ids of the users whose presence that socket is subscribed to.
+# Built once at connect; presence changes are emitted to the "presence_{id}"
+# room, which holds only the sockets that have that user in their roster.
+presence_rosters = {}
+
+async def subscribe_presence(user_id: str, contact_id: str):
+    """Subscribe every live socket of user_id to contact_id's presence"""
+    for sid, _ in list(sio.manager.get_participants('/', f"user_{user_id}")):
+        roster = presence_rosters.get(sid)
+        if roster is not None and contact_id not in roster:
+            roster.add(contact_id)
+            await sio.enter_room(sid, f"presence_{contact_id}")
+
+async def subscribe_conversation_presence(sender_id: str, receiver_id: str):
+    # A new conversation puts each participant in the other's roster
+    await subscribe_presence(sender_id, receiver_id)
+    await subscribe_presence(receiver_id, sender_id)
+
 @sio.event
 async def connect(sid, environ, auth):
-    print(f"Client {sid} connected")
+    logger.info("Client connected", extra={"event": "connect"})
     
     # Extract token from auth
     if auth and 'token' in auth:
@@ -222,61 +339,140 @@ async def connect(sid, environ, auth):
             payload = jwt.decode(auth['token'], JWT_SECRET, algorithms=[JWT_ALGORITHM])
             user_id = payload.get("sub")
             if user_id:
+                user_id_var.set(user_id)
                 connected_users[sid] = user_id
                 await sio.enter_room(sid, f"user_{user_id}")
                 
+                # Subscribe to the presence of everyone in the user's roster
+                roster = await get_roster(user_id)
+                presence_rosters[sid] = roster
+                for contact_id in roster:
+                    await sio.enter_room(sid, f"presence_{contact_id}")
+                
                 # Update user online status
                 await db.users.update_one({"id": user_id}, {"$set": {"is_online": True}})
                 
-                # Notify other users
-                await sio.emit('user_online', {'user_id': user_id}, skip_sid=sid)
+                # Notify users who have this user in their roster
+                await sio.emit('user_online', {'user_id': user_id}, room=f"presence_{user_id}", skip_sid=sid)
                 
         except jwt.PyJWTError:
             await sio.disconnect(sid)
 
 @sio.event
 async def disconnect(sid):
-    print(f"Client {sid} disconnected")
+    logger.info("Client disconnected", extra={"event": "disconnect"})
     
     if sid in connected_users:
         user_id = connected_users[sid]
         del connected_users[sid]
+        presence_rosters.pop(sid, None)
         
         # Update user offline status
         await db.users.update_one({"id": user_id}, {"$set": {"is_online": False}})
         
-        # Notify other users
-        await sio.emit('user_offline', {'user_id': user_id}, skip_sid=sid)
+        # Notify users who have this user in their roster
+        await sio.emit('user_offline', {'user_id': user_id}, room=f"presence_{user_id}", skip_sid=sid)
 
 @sio.event
 async def send_message(sid, data):
     if sid not in connected_users:
         return
     
-    sender_id = connected_users[sid]
-    receiver_id = data.get('receiver_id')
-    content = data.get('content')
-    
-    if not receiver_id or not content:
+    # Validate like POST /api/messages does
+    try:
+        message_data = MessageCreate(**data)
+    except (TypeError, ValidationError):
+        return
+    if not message_data.receiver_id or not message_data.content:
         return
     
+    sender_id = connected_users[sid]
+    receiver_id = message_data.receiver_id
+    
     # Create message
     message = Message(
         sender_id=sender_id,
         receiver_id=receiver_id,
-        content=content
+        content=message_data.content,
+        message_type=message_data.message_type,
+        expires_at=await message_expiry(sender_id, receiver_id, message_data.ttl_seconds)
     )
     
     await db.messages.insert_one(message.dict())
+    schedule_expiry_notice(message)
+    await subscribe_conversation_presence(sender_id, receiver_id)
     
-    # Get sender info
-    sender = await db.users.find_one({"id": sender_id})
+    # Get sender info, unless the wire protocol references senders by id
+    sender = None
+    if uses_sender_profile(WIRE_PROTOCOL):
+        sender = UserResponse(**await db.users.find_one({"id": sender_id})).dict()
     
     # Emit to receiver
-    await sio.emit('new_message', {
-        'message': message.dict(),
-        'sender': UserResponse(**sender).dict()
-    }, room=f"user_{receiver_id}")
+    await sio.emit('new_message', encode_new_message(message.dict(), sender, WIRE_PROTOCOL),
+                   room=f"user_{receiver_id}")
+    
+    # Acknowledge with the stored message so the sender can replace its
+    # optimistic copy, which has no server id or expires_at
+    return encode_new_message(message.dict(), None, WIRE_PROTOCOL)
+
+async def notify_expiring_messages(since: datetime, until: datetime):
+    """Send messages_expired for messages due in (since, until].
+
+    Each participant gets one emit per batch. Deleting is left to the TTL index.
+    """
+    after = None
+    while True:
+        query = {"expires_at": {"$gt": since, "$lte": until}}
+        if after:
+            query["$or"] = [
+                {"expires_at": {"$gt": after["expires_at"]}},
+                {"expires_at": after["expires_at"], "id": {"$gt": after["id"]}}
+            ]
+        batch = await db.messages.find(
+            query, {"_id": 0, "id": 1, "sender_id": 1, "receiver_id": 1, "expires_at": 1}
+        ).sort([("expires_at", 1), ("id", 1)]).limit(EXPIRY_NOTIFY_BATCH).to_list(EXPIRY_NOTIFY_BATCH)
+        
+        expired_by_user = {}
+        for message in batch:
+            expired_by_user.setdefault(message["sender_id"], []).append(message["id"])
+            expired_by_user.setdefault(message["receiver_id"], []).append(message["id"])
+        for user_id, message_ids in expired_by_user.items():
+            await sio.emit('messages_expired', {'message_ids': message_ids}, room=f"user_{user_id}")
+        
+        if len(batch) < EXPIRY_NOTIFY_BATCH:
+            return
+        after = batch[-1]
+
+async def notify_expired_message(message: Message):
+    await asyncio.sleep(max(0.0, (message.expires_at - datetime.utcnow()).total_seconds()))
+    for user_id in (message.sender_id, message.receiver_id):
+        await sio.emit('messages_expired', {'message_ids': [message.id]}, room=f"user_{user_id}")
+
+def schedule_expiry_notice(message: Message):
+    """Announce a new message that is due inside a window already notified"""
+    if not message.expires_at or not expiry_notified_until or message.expires_at > expiry_notified_until:
+        return
+    task = asyncio.create_task(notify_expired_message(message))
+    expiry_notices.add(task)
+    task.add_done_callback(expiry_notices.discard)
+
+async def run_expiry_notifier():
+    # Rooms only span this process's sockets, so every worker notifies its own
+    # clients. Each pass looks one interval ahead: the TTL monitor may delete
+    # a message as soon as it is due, and a slightly early notice beats none.
+    global expiry_notified_until
+    since = datetime.utcnow()
+    while True:
+        await asyncio.sleep(EXPIRY_NOTIFY_SECONDS)
+        until = datetime.utcnow() + timedelta(seconds=EXPIRY_NOTIFY_SECONDS)
+        # Set before the query, so a message inserted while the pass runs is
+        # announced at least once: by the pass, its insert path, or both
+        expiry_notified_until = until
+        try:
+            await notify_expiring_messages(since, until)
+            since = until
+        except Exception:
+            logger.exception("Expired message notification failed", extra={"event": "expiry_notify"})
 
 # WebRTC Signaling Events
 @sio.event
@@ -362,9 +558,14 @@ async def ice_candidate(sid, data):
         'candidate': candidate
     }, room=f"user_{other_user_id}")
 
+# Bind sid/user_id log correlation ids for every Socket.IO handler
+bind_socket_context(sio, connected_users)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(RequestIdMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -373,16 +574,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+SOCKETIO_LOGGERS = ('socketio.server', 'engineio.server')
 logger = logging.getLogger(__name__)
 
+# Configure logging: JSON lines written from a background thread. Done at
+# startup rather than import so importing this module has no side effects.
+# Socket.IO logs every emit and room change and Engine.IO every packet, so
+# both stay quiet unless raised at runtime.
+@app.on_event("startup")
+async def start_logging():
+    setup_logging(
+        level=os.environ.get('LOG_LEVEL', 'INFO'),
+        sample_rates=json.loads(os.environ.get('LOG_SAMPLE_RATES', '{}')),
+        logger_levels={
+            'socketio.server': os.environ.get('SOCKETIO_LOG_LEVEL', 'WARNING'),
+            'engineio.server': os.environ.get('ENGINEIO_LOG_LEVEL', 'WARNING')
+        },
+        queue_size=int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    )
+
+@app.on_event("startup")
+async def create_indexes():
+    for collection, keys, options in INDEXES:
+        await db[collection].create_index(keys, **options)
+
+expiry_notifier = None
+
+@app.on_event("startup")
+async def start_expiry_notifier():
+    global expiry_notifier
+    expiry_notifier = asyncio.create_task(run_expiry_notifier())
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    for route in api_router.routes:
+        if hasattr(route, "endpoint"):
+            loop_monitor.register_handler(f"{','.join(sorted(route.methods))} {route.path}", route.endpoint)
+    for event, handler in sio.handlers.get('/', {}).items():
+        loop_monitor.register_handler(f"sio:{event}", inspect.unwrap(handler))
+    loop_monitor.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    loop_monitor.stop()
+    if expiry_notifier:
+        expiry_notifier.cancel()
+    for notice in list(expiry_notices):
+        notice.cancel()
     client.close()
+    shutdown_logging()
 
 # Use the socket_app instead of app for ASGI
 app = socket_app
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""Socket.IO payload encoding for ``new_message`` events.
+
+Two wire protocols are supported, selected in ``server.py`` with the
+``WIRE_PROTOCOL`` environment variable:
+
+``json`` (default)
+    Text packets carrying the full message and the sender's ``UserResponse``.
+
+``msgpack``
+    Binary MessagePack packets. The message is packed positionally with
+    datetimes as epoch milliseconds, and the sender is referenced by the
+    ``sender_id`` already in the message instead of an embedded profile; the
+    client resolves it from its user list. The frontend must be built with
+    ``REACT_APP_WIRE_PROTOCOL=msgpack`` to match.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi.encoders import jsonable_encoder
+
+# Positional layout of a compact message; trailing defaults are omitted
+COMPACT_MESSAGE_FIELDS = ('id', 'sender_id', 'receiver_id', 'content', 'timestamp', 'message_type', 'expires_at')
+COMPACT_DEFAULTS = {'message_type': 'text', 'expires_at': None}
+COMPACT_DATETIME_FIELDS = ('timestamp', 'expires_at')
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def socketio_serializer(protocol: str) -> str:
+    return 'msgpack' if protocol == 'msgpack' else 'default'
+
+
+def uses_sender_profile(protocol: str) -> bool:
+    """Whether ``new_message`` payloads embed the sender's profile."""
+    return protocol != 'msgpack'
+
+
+def _to_millis(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((value - EPOCH).total_seconds() * 1000)
+
+
+def _from_millis(value: int) -> datetime:
+    return datetime.utcfromtimestamp(value / 1000)
+
+
+def encode_new_message(message: dict, sender: Optional[dict], protocol: str) -> dict:
+    if protocol == 'msgpack':
+        packed = [
+            _to_millis(message[field]) if field in COMPACT_DATETIME_FIELDS and message.get(field) else message.get(field)
+            for field in COMPACT_MESSAGE_FIELDS
+        ]
+        while packed:
+            field = COMPACT_MESSAGE_FIELDS[len(packed) - 1]
+            if field not in COMPACT_DEFAULTS or COMPACT_DEFAULTS[field] != packed[-1]:
+                break
+            packed.pop()
+        return {'m': packed}
+
+    return {
+        'message': jsonable_encoder(message),
+        'sender': sender
+    }
+
+
+def decode_new_message(payload: dict) -> dict:
+    """Inverse of ``encode_new_message``; returns the message as a dict."""
+    if 'm' not in payload:
+        return payload['message']
+
+    message = dict(COMPACT_DEFAULTS)
+    message.update(zip(COMPACT_MESSAGE_FIELDS, payload['m']))
+    for field in COMPACT_DATETIME_FIELDS:
+        if message[field] is not None:
+            message[field] = _from_millis(message[field])
+    return message
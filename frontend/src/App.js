@@ -1,8 +1,34 @@
 import React, { useState, useEffect } from 'react';
 import io from 'socket.io-client';
 import './App.css';
+import msgpackParser from './msgpackParser';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
+// Must match the backend's WIRE_PROTOCOL: 'json' or 'msgpack'
+const WIRE_PROTOCOL = process.env.REACT_APP_WIRE_PROTOCOL || 'json';
+
+// Positional layout of compact messages, see backend/wire.py
+const COMPACT_MESSAGE_FIELDS = ['id', 'sender_id', 'receiver_id', 'content', 'timestamp', 'message_type', 'expires_at'];
+const COMPACT_DEFAULTS = { message_type: 'text', expires_at: null };
+
+// The API sends naive UTC datetimes (no "Z"); render compact ones the same way
+// so live messages and reloaded history are parsed identically
+const toServerTimestamp = (millis) => new Date(millis).toISOString().slice(0, -1);
+
+const decodeNewMessage = (data) => {
+  if (!data.m) {
+    return data.message;
+  }
+  const message = { ...COMPACT_DEFAULTS };
+  data.m.forEach((value, index) => {
+    message[COMPACT_MESSAGE_FIELDS[index]] = value;
+  });
+  message.timestamp = toServerTimestamp(message.timestamp);
+  if (message.expires_at !== null) {
+    message.expires_at = toServerTimestamp(message.expires_at);
+  }
+  return message;
+};
 
 function App() {
   const [user, setUser] = useState(null);
@@ -42,7 +68,8 @@ function App() {
 
   const initializeSocket = (token) => {
     const newSocket = io(BACKEND_URL, {
-      auth: { token }
+      auth: { token },
+      ...(WIRE_PROTOCOL === 'msgpack' ? { parser: msgpackParser } : {})
     });
 
     newSocket.on('connect', () => {
@@ -51,11 +78,17 @@ function App() {
     });
 
     newSocket.on('new_message', (data) => {
-      if (selectedUser && (data.message.sender_id === selectedUser.id || data.message.receiver_id === selectedUser.id)) {
-        setMessages(prev => [...prev, data.message]);
+      const message = decodeNewMessage(data);
+      if (selectedUser && (message.sender_id === selectedUser.id || message.receiver_id === selectedUser.id)) {
+        setMessages(prev => [...prev, message]);
       }
     });
 
+    newSocket.on('messages_expired', (data) => {
+      const expiredIds = new Set(data.message_ids);
+      setMessages(prev => prev.filter(m => !expiredIds.has(m.id)));
+    });
+
     newSocket.on('user_online', (data) => {
       setUsers(prev => prev.map(u => 
         u.id === data.user_id ? { ...u, is_online: true } : u
@@ -175,8 +208,6 @@ function App() {
         content: messageInput
       };
       
-      socket.emit('send_message', messageData);
-      
       // Add message to local state optimistically
       const newMessage = {
         id: Date.now().toString(),
@@ -187,6 +218,15 @@ function App() {
       };
       setMessages(prev => [...prev, newMessage]);
       setMessageInput('');
+
+      // The server acks with the stored message; swap it in so the local copy
+      // carries the real id and expires_at and is evicted when it expires
+      socket.emit('send_message', messageData, (stored) => {
+        if (stored) {
+          const message = decodeNewMessage(stored);
+          setMessages(prev => prev.map(m => (m.id === newMessage.id ? message : m)));
+        }
+      });
     }
   };
 
@@ -0,0 +1,244 @@
+// Socket.IO parser that sends packets as MessagePack, matching the backend's
+// serializer='msgpack' (python-socketio MsgPackPacket). Pass it as the
+// `parser` option of io(). Only the MessagePack types the backend produces
+// are supported: nil, booleans, numbers, strings, binary, arrays and maps.
+
+const PACKET_TYPES = [0, 1, 2, 3, 4, 5, 6];
+
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
+const encodeValue = (value, bytes) => {
+  if (value === null || value === undefined) {
+    bytes.push(0xc0);
+  } else if (value === false) {
+    bytes.push(0xc2);
+  } else if (value === true) {
+    bytes.push(0xc3);
+  } else if (typeof value === 'number') {
+    encodeNumber(value, bytes);
+  } else if (typeof value === 'string') {
+    const encoded = textEncoder.encode(value);
+    const length = encoded.length;
+    if (length < 32) {
+      bytes.push(0xa0 | length);
+    } else if (length < 0x100) {
+      bytes.push(0xd9, length);
+    } else if (length < 0x10000) {
+      bytes.push(0xda, length >> 8, length & 0xff);
+    } else {
+      bytes.push(0xdb, ...uint32(length));
+    }
+    pushAll(bytes, encoded);
+  } else if (value instanceof ArrayBuffer || ArrayBuffer.isView(value)) {
+    const encoded = value instanceof ArrayBuffer
+      ? new Uint8Array(value)
+      : new Uint8Array(value.buffer, value.byteOffset, value.byteLength);
+    const length = encoded.length;
+    if (length < 0x100) {
+      bytes.push(0xc4, length);
+    } else if (length < 0x10000) {
+      bytes.push(0xc5, length >> 8, length & 0xff);
+    } else {
+      bytes.push(0xc6, ...uint32(length));
+    }
+    pushAll(bytes, encoded);
+  } else if (Array.isArray(value)) {
+    encodeLength(value.length, 0x90, 0xdc, bytes);
+    value.forEach(item => encodeValue(item, bytes));
+  } else if (typeof value === 'object') {
+    const keys = Object.keys(value).filter(key => value[key] !== undefined);
+    encodeLength(keys.length, 0x80, 0xde, bytes);
+    keys.forEach(key => {
+      encodeValue(key, bytes);
+      encodeValue(value[key], bytes);
+    });
+  } else {
+    throw new Error(`Cannot encode ${typeof value} as MessagePack`);
+  }
+};
+
+const encodeNumber = (value, bytes) => {
+  if (Number.isInteger(value) && value >= 0 && value < 0x100000000) {
+    if (value < 0x80) {
+      bytes.push(value);
+    } else if (value < 0x100) {
+      bytes.push(0xcc, value);
+    } else if (value < 0x10000) {
+      bytes.push(0xcd, value >> 8, value & 0xff);
+    } else {
+      bytes.push(0xce, ...uint32(value));
+    }
+  } else if (Number.isInteger(value) && value < 0 && value >= -0x80000000) {
+    if (value >= -32) {
+      bytes.push(value & 0xff);
+    } else if (value >= -0x80) {
+      bytes.push(0xd0, value & 0xff);
+    } else if (value >= -0x8000) {
+      bytes.push(0xd1, (value >> 8) & 0xff, value & 0xff);
+    } else {
+      bytes.push(0xd2, ...uint32(value >>> 0));
+    }
+  } else {
+    const view = new DataView(new ArrayBuffer(8));
+    view.setFloat64(0, value);
+    bytes.push(0xcb);
+    pushAll(bytes, new Uint8Array(view.buffer));
+  }
+};
+
+const encodeLength = (length, fixPrefix, prefix16, bytes) => {
+  if (length < 16) {
+    bytes.push(fixPrefix | length);
+  } else if (length < 0x10000) {
+    bytes.push(prefix16, length >> 8, length & 0xff);
+  } else {
+    bytes.push(prefix16 + 1, ...uint32(length));
+  }
+};
+
+const uint32 = (value) => [(value >>> 24) & 0xff, (value >>> 16) & 0xff, (value >>> 8) & 0xff, value & 0xff];
+
+const pushAll = (bytes, values) => {
+  for (let i = 0; i < values.length; i++) {
+    bytes.push(values[i]);
+  }
+};
+
+export const encode = (value) => {
+  const bytes = [];
+  encodeValue(value, bytes);
+  return new Uint8Array(bytes);
+};
+
+export const decode = (buffer) => {
+  const data = buffer instanceof Uint8Array ? buffer : new Uint8Array(buffer);
+  const view = new DataView(data.buffer, data.byteOffset, data.byteLength);
+  let offset = 0;
+
+  const read = (length) => {
+    const slice = data.subarray(offset, offset + length);
+    offset += length;
+    return slice;
+  };
+  const uint = (size) => {
+    let value;
+    if (size === 1) value = view.getUint8(offset);
+    else if (size === 2) value = view.getUint16(offset);
+    else if (size === 4) value = view.getUint32(offset);
+    else value = view.getUint32(offset) * 0x100000000 + view.getUint32(offset + 4);
+    offset += size;
+    return value;
+  };
+  const int = (size) => {
+    let value;
+    if (size === 1) value = view.getInt8(offset);
+    else if (size === 2) value = view.getInt16(offset);
+    else if (size === 4) value = view.getInt32(offset);
+    else value = view.getInt32(offset) * 0x100000000 + view.getUint32(offset + 4);
+    offset += size;
+    return value;
+  };
+  const string = (length) => textDecoder.decode(read(length));
+  const array = (length) => Array.from({ length }, () => next());
+  const map = (length) => {
+    const result = {};
+    for (let i = 0; i < length; i++) {
+      const key = next();
+      result[key] = next();
+    }
+    return result;
+  };
+
+  const next = () => {
+    const byte = uint(1);
+    if (byte < 0x80) return byte;
+    if (byte < 0x90) return map(byte & 0x0f);
+    if (byte < 0xa0) return array(byte & 0x0f);
+    if (byte < 0xc0) return string(byte & 0x1f);
+    if (byte >= 0xe0) return byte - 0x100;
+    switch (byte) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return read(uint(1)).slice().buffer;
+      case 0xc5: return read(uint(2)).slice().buffer;
+      case 0xc6: return read(uint(4)).slice().buffer;
+      case 0xca: { const value = view.getFloat32(offset); offset += 4; return value; }
+      case 0xcb: { const value = view.getFloat64(offset); offset += 8; return value; }
+      case 0xcc: return uint(1);
+      case 0xcd: return uint(2);
+      case 0xce: return uint(4);
+      case 0xcf: return uint(8);
+      case 0xd0: return int(1);
+      case 0xd1: return int(2);
+      case 0xd2: return int(4);
+      case 0xd3: return int(8);
+      case 0xd9: return string(uint(1));
+      case 0xda: return string(uint(2));
+      case 0xdb: return string(uint(4));
+      case 0xdc: return array(uint(2));
+      case 0xdd: return array(uint(4));
+      case 0xde: return map(uint(2));
+      case 0xdf: return map(uint(4));
+      default: throw new Error(`Unsupported MessagePack type 0x${byte.toString(16)}`);
+    }
+  };
+
+  const value = next();
+  if (offset !== data.length) {
+    throw new Error('Trailing bytes after MessagePack value');
+  }
+  return value;
+};
+
+export class Encoder {
+  encode(packet) {
+    return [encode(packet)];
+  }
+}
+
+export class Decoder {
+  constructor() {
+    this.listeners = {};
+  }
+
+  on(event, listener) {
+    (this.listeners[event] = this.listeners[event] || []).push(listener);
+    return this;
+  }
+
+  off(event, listener) {
+    if (!event) {
+      this.listeners = {};
+    } else if (this.listeners[event]) {
+      this.listeners[event] = listener ? this.listeners[event].filter(l => l !== listener) : [];
+    }
+    return this;
+  }
+
+  add(chunk) {
+    if (typeof chunk === 'string') {
+      throw new Error('Expected a binary MessagePack packet');
+    }
+    const packet = decode(chunk);
+    if (packet && packet.nsp === null) {
+      packet.nsp = '/';
+    }
+    if (!packet || !PACKET_TYPES.includes(packet.type) || typeof packet.nsp !== 'string') {
+      throw new Error('Invalid Socket.IO packet');
+    }
+    if (packet.id === null) {
+      delete packet.id;
+    }
+    (this.listeners.decoded || []).forEach(listener => listener(packet));
+  }
+
+  destroy() {
+    this.off();
+  }
+}
+
+const msgpackParser = { Encoder, Decoder };
+
+export default msgpackParser;
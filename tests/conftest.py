@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# The backend is run from its own directory, so its modules import each other
+# as top level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def emitted(request, monkeypatch):
+    """Run ``server`` against an in-memory database and record its emits.
+
+    Each entry is ``(event, data, room)``. The database name can be set with
+    indirect parametrization and defaults to one per test module.
+    """
+    import server
+
+    db_name = getattr(request, "param", request.module.__name__.rsplit(".", 1)[-1])
+    monkeypatch.setattr(server, "db", AsyncMongoMockClient()[db_name])
+    monkeypatch.setattr(server, "connected_users", {})
+    monkeypatch.setattr(server, "presence_rosters", {})
+    emits = []
+
+    async def fake_emit(event, data=None, room=None, **kwargs):
+        emits.append((event, data, room))
+
+    monkeypatch.setattr(server.sio, "emit", fake_emit)
+    return emits
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import queue
+
+import pytest
+
+import log_pipeline
+from log_pipeline import ContextFilter, NonBlockingQueueHandler, RequestIdMiddleware, configure
+
+
+@pytest.fixture(autouse=True)
+def sample_rates(monkeypatch):
+    monkeypatch.setattr(log_pipeline, "_sample_rates", {})
+
+
+def make_record(level, name="server", event=None):
+    record = logging.LogRecord(name, level, __file__, 1, "message", None, None)
+    if event:
+        record.event = event
+    return record
+
+
+def test_sampling_drops_records_of_the_configured_event():
+    configure(sample_rates={"connect": 0.0})
+    log_filter = ContextFilter()
+    assert not log_filter.filter(make_record(logging.INFO, event="connect"))
+    assert log_filter.filter(make_record(logging.INFO, event="disconnect"))
+
+
+def test_sampling_falls_back_to_logger_name():
+    configure(sample_rates={"engineio.server": 0.0})
+    assert not ContextFilter().filter(make_record(logging.DEBUG, name="engineio.server"))
+
+
+def test_warnings_and_errors_are_never_sampled_out():
+    configure(sample_rates={"connect": 0.0, "engineio.server": 0.0})
+    log_filter = ContextFilter()
+    for level in (logging.WARNING, logging.ERROR, logging.CRITICAL):
+        assert log_filter.filter(make_record(level, event="connect"))
+        assert log_filter.filter(make_record(level, name="engineio.server"))
+
+
+def test_filter_attaches_correlation_ids():
+    token = log_pipeline.sid_var.set("sid-1")
+    try:
+        record = make_record(logging.INFO)
+        assert ContextFilter().filter(record)
+    finally:
+        log_pipeline.sid_var.reset(token)
+    assert record.sid == "sid-1"
+    assert record.request_id is None
+
+
+def test_full_queue_drops_and_counts_records():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    for _ in range(3):
+        handler.handle(make_record(logging.INFO))
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
+
+
+def test_request_id_middleware_binds_and_echoes_header():
+    seen = {}
+    sent = []
+
+    async def app(scope, receive, send):
+        seen["request_id"] = log_pipeline.request_id_var.get()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"x-request-id", b"abc123")]}
+    asyncio.run(RequestIdMiddleware(app)(scope, None, send))
+
+    assert seen["request_id"] == "abc123"
+    assert (b"x-request-id", b"abc123") in sent[0]["headers"]
+    assert log_pipeline.request_id_var.get() is None
+
+
+def test_setup_logging_takes_over_uvicorn_loggers():
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    access = logging.getLogger("uvicorn.access")
+    access.addHandler(logging.NullHandler())
+    access.propagate = False
+    try:
+        log_pipeline.setup_logging()
+        assert access.handlers == []
+        assert access.propagate
+        assert root.handlers == [log_pipeline._handler]
+    finally:
+        log_pipeline.shutdown_logging()
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
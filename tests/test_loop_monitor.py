@@ -0,0 +1,28 @@
+import asyncio
+import time
+
+from loop_monitor import LoopMonitor
+
+
+async def blocking_handler():
+    time.sleep(0.3)
+
+
+def test_stall_is_attributed_to_blocking_handler():
+    async def scenario():
+        monitor = LoopMonitor(interval=0.02, threshold=0.1)
+        monitor.register_handler("sio:blocking", blocking_handler)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.1)
+            await blocking_handler()
+            await asyncio.sleep(0.1)
+        finally:
+            monitor.stop()
+        return monitor.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["stalls"] == 1
+    event = stats["slow_callbacks"][0]
+    assert event["handler"] == "sio:blocking"
+    assert event["blocked_ms"] >= 200
@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from wire import decode_new_message
+
+NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+async def insert_message(sender_id, receiver_id, expires_in):
+    message = server.Message(
+        sender_id=sender_id, receiver_id=receiver_id, content="bye",
+        expires_at=NOW + timedelta(seconds=expires_in)
+    )
+    await server.db.messages.insert_one(message.dict())
+    return message.id
+
+
+def test_notifications_are_batched_per_participant(emitted, monkeypatch):
+    monkeypatch.setattr(server, "EXPIRY_NOTIFY_BATCH", 2)
+
+    async def scenario():
+        first = await insert_message("alice", "bob", 1)
+        second = await insert_message("alice", "bob", 2)
+        third = await insert_message("carol", "alice", 3)
+        await insert_message("alice", "bob", 60)  # outside the window
+        await server.notify_expiring_messages(NOW, NOW + timedelta(seconds=5))
+        remaining = await server.db.messages.count_documents({})
+        return first, second, third, remaining
+
+    first, second, third, remaining = asyncio.run(scenario())
+
+    assert emitted == [
+        ("messages_expired", {"message_ids": [first, second]}, "user_alice"),
+        ("messages_expired", {"message_ids": [first, second]}, "user_bob"),
+        ("messages_expired", {"message_ids": [third]}, "user_carol"),
+        ("messages_expired", {"message_ids": [third]}, "user_alice"),
+    ]
+    # Deleting is the TTL index's job
+    assert remaining == 4
+
+
+def test_nothing_due_sends_nothing(emitted):
+    async def scenario():
+        await insert_message("alice", "bob", 60)
+        await server.notify_expiring_messages(NOW, NOW + timedelta(seconds=5))
+
+    asyncio.run(scenario())
+    assert emitted == []
+
+
+def test_socket_send_acks_stored_message_with_expiry(emitted, monkeypatch):
+    async def scenario():
+        await server.db.users.insert_one(
+            server.User(id="alice", username="alice", email="a@example.com", password_hash="x").dict()
+        )
+        monkeypatch.setitem(server.connected_users, "sid-alice", "alice")
+        return await server.sio.handlers["/"]["send_message"](
+            "sid-alice", {"receiver_id": "bob", "content": "hi", "ttl_seconds": 30}
+        )
+
+    ack = decode_new_message(asyncio.run(scenario()))
+    assert ack["sender_id"] == "alice"
+    assert ack["expires_at"] is not None
+    assert ack["id"] == emitted[-1][1]["message"]["id"]
+
+
+def test_message_due_inside_notified_window_is_announced_by_insert(emitted, monkeypatch):
+    # A pass has already covered the next five seconds
+    monkeypatch.setattr(server, "expiry_notified_until", datetime.utcnow() + timedelta(seconds=5))
+    monkeypatch.setitem(server.connected_users, "sid-alice", "alice")
+
+    async def scenario():
+        await server.db.users.insert_one(
+            server.User(id="alice", username="alice", email="a@example.com", password_hash="x").dict()
+        )
+        send = server.sio.handlers["/"]["send_message"]
+        due = decode_new_message(await send("sid-alice", {"receiver_id": "bob", "content": "soon", "ttl_seconds": 1}))
+        await send("sid-alice", {"receiver_id": "bob", "content": "later", "ttl_seconds": 60})
+        assert len(server.expiry_notices) == 1
+        await asyncio.gather(*server.expiry_notices)
+        return due["id"]
+
+    due_id = asyncio.run(scenario())
+    expired = [(data, room) for event, data, room in emitted if event == "messages_expired"]
+    assert expired == [
+        ({"message_ids": [due_id]}, "user_alice"),
+        ({"message_ids": [due_id]}, "user_bob"),
+    ]
+
+
+def test_socket_send_rejects_invalid_ttl(emitted, monkeypatch):
+    monkeypatch.setitem(server.connected_users, "sid-alice", "alice")
+
+    async def scenario():
+        for ttl_seconds in (True, 0, "30", 1.5):
+            ack = await server.sio.handlers["/"]["send_message"](
+                "sid-alice", {"receiver_id": "bob", "content": "hi", "ttl_seconds": ttl_seconds}
+            )
+            assert ack is None
+        return await server.db.messages.count_documents({})
+
+    assert asyncio.run(scenario()) == 0
+    assert emitted == []
+
+
+def test_expiry_lookup_requires_existing_user(emitted):
+    current_user = server.User(id="alice", username="alice", email="a@example.com", password_hash="x")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_conversation_expiry("ghost", current_user=current_user))
+    assert error.value.status_code == 404
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+import socketio
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def manager(monkeypatch):
+    # Presence lives in rooms, so these tests need a real room manager
+    manager = socketio.AsyncManager()
+    manager.set_server(server.sio)
+    manager.initialize()
+    monkeypatch.setattr(server.sio, "manager", manager)
+    return manager
+
+
+async def connect(user_id):
+    sid = await server.sio.manager.connect(f"eio-{user_id}", "/")
+    token = server.create_access_token({"sub": user_id})
+    await server.sio.handlers["/"]["connect"](sid, {}, {"token": token})
+    return sid
+
+
+def participants(room):
+    return {sid for sid, _ in server.sio.manager.get_participants("/", room)}
+
+
+async def seed_users(*user_ids):
+    for user_id in user_ids:
+        await server.db.users.insert_one(
+            server.User(id=user_id, username=user_id, email=f"{user_id}@example.com", password_hash="x").dict()
+        )
+
+
+def test_user_online_only_reaches_roster(emitted):
+    async def scenario():
+        await seed_users("alice", "bob", "carol")
+        await server.db.messages.insert_one(server.Message(sender_id="bob", receiver_id="alice", content="hi").dict())
+
+        bob = await connect("bob")
+        carol = await connect("carol")
+        await connect("alice")
+
+        assert ("user_online", {"user_id": "alice"}, "presence_alice") in emitted
+        # Nothing goes out as a global broadcast
+        assert all(room is not None for _, _, room in emitted)
+        assert participants("presence_alice") == {bob}
+        assert carol not in participants("presence_alice")
+
+    asyncio.run(scenario())
+
+
+def test_first_message_subscribes_both_participants(emitted):
+    async def scenario():
+        await seed_users("alice", "carol")
+        alice = await connect("alice")
+        carol = await connect("carol")
+        assert participants("presence_alice") == set()
+
+        await server.sio.handlers["/"]["send_message"](alice, {"receiver_id": "carol", "content": "hello"})
+
+        assert participants("presence_alice") == {carol}
+        assert participants("presence_carol") == {alice}
+        assert server.presence_rosters[alice] == {"carol"}
+        assert server.presence_rosters[carol] == {"alice"}
+
+    asyncio.run(scenario())
@@ -0,0 +1,36 @@
+import random
+
+from benchmark import QUERIES, run_queries
+from models import INDEXES, Message, User
+from seed_data import get_database, seed
+
+DB_NAME = "seed_benchmark_test"
+
+
+def test_seed_builds_api_shaped_documents_and_indexes():
+    timings = seed("memory", "", DB_NAME, users=20, messages=150, workers=2, batch_size=40, drop=True)
+    db = get_database("memory", "", DB_NAME)
+
+    assert set(timings) == {"users_seconds", "messages_seconds", "indexes_seconds"}
+    assert db.users.count_documents({}) == 20
+    assert db.messages.count_documents({}) == 150
+    assert set(db.users.find_one({}, {"_id": 0})) == set(User.__fields__)
+    assert set(db.messages.find_one({}, {"_id": 0})) == set(Message.__fields__)
+
+    for collection, keys, options in INDEXES:
+        index = db[collection].index_information()["_".join(f"{field}_{order}" for field, order in keys)]
+        assert index["key"] == keys
+        for option, value in options.items():
+            assert index[option] == value
+
+
+def test_run_queries_reports_every_query():
+    seed("memory", "", DB_NAME, users=10, messages=50, workers=2, drop=True)
+    db = get_database("memory", "", DB_NAME)
+
+    results = run_queries(db, total_users=10, iterations=3, rng=random.Random(0))
+
+    assert set(results) == set(QUERIES) == {"register_duplicate_check", "get_users", "get_messages"}
+    for result in results.values():
+        assert set(result) == {"query", "models", "plan"}
+        assert result["query"]["p50_ms"] >= 0
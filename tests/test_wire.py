@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from wire import decode_new_message, encode_new_message, uses_sender_profile
+
+
+def make_message(**overrides):
+    message = {
+        "id": "m1",
+        "sender_id": "alice",
+        "receiver_id": "bob",
+        "content": "hi",
+        "timestamp": datetime(2024, 1, 1, 1, 2, 3, 456000),
+        "message_type": "text",
+        "expires_at": None,
+    }
+    message.update(overrides)
+    return message
+
+
+def test_msgpack_omits_trailing_defaults():
+    payload = encode_new_message(make_message(), None, "msgpack")
+    assert payload == {"m": ["m1", "alice", "bob", "hi", 1704070923456]}
+    assert decode_new_message(payload) == make_message()
+
+
+def test_msgpack_round_trips_non_default_message_type():
+    message = make_message(message_type="image")
+    payload = encode_new_message(message, None, "msgpack")
+    assert len(payload["m"]) == 6
+    assert decode_new_message(payload) == message
+
+
+def test_msgpack_round_trips_expires_at():
+    message = make_message(expires_at=datetime(2024, 1, 2))
+    payload = encode_new_message(message, None, "msgpack")
+    assert payload["m"][-2:] == ["text", 1704153600000]
+    assert decode_new_message(payload) == message
+
+
+def test_json_payload_is_serializable_and_embeds_sender():
+    sender = {"id": "alice", "username": "alice", "email": "a@example.com", "is_online": True}
+    payload = encode_new_message(make_message(), sender, "json")
+    assert payload["sender"] == sender
+    assert payload["message"]["timestamp"] == "2024-01-01T01:02:03.456000"
+    assert decode_new_message(payload) == payload["message"]
+
+
+def test_only_json_embeds_sender_profile():
+    assert uses_sender_profile("json")
+    assert not uses_sender_profile("msgpack")